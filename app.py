@@ -2,15 +2,48 @@ from flask import Flask, request, jsonify, send_file, render_template, Response
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import os
+import re
 import uuid
 import tempfile
-from langdetect import detect, DetectorFactory
+from functools import lru_cache
+from langdetect.detector_factory import DetectorFactory, PROFILES_DIRECTORY
 from tts_english_online import english_online_tts
 from english_offline_tts import generate_english_offline_tts
 from tts_urdu import generate_urdu_tts
 from text_extractor import extract_text_from_file, get_supported_extensions
 
-DetectorFactory.seed = 0
+# Only load the n-gram profiles this app can actually tell apart
+LANGDETECT_LANGUAGES = ['en', 'ur', 'ar', 'hi', 'fa']
+
+def _load_language_factory():
+    """Build a single seeded detector factory from the subset profiles"""
+    profiles = []
+    for lang in LANGDETECT_LANGUAGES:
+        with open(os.path.join(PROFILES_DIRECTORY, lang), 'r', encoding='utf-8') as f:
+            profiles.append(f.read())
+    factory = DetectorFactory()
+    factory.load_json_profile(profiles)
+    factory.set_seed(0)
+    return factory
+
+_language_factory = None
+
+def get_language_factory():
+    """Load the detector profiles on first use so importing the app stays cheap"""
+    global _language_factory
+    if _language_factory is None:
+        _language_factory = _load_language_factory()
+    return _language_factory
+
+# Urdu letters used to re-label Hindi/Arabic detections, matched in one pass
+URDU_CHAR_RE = re.compile('[ابتثجحخدذرزسشصضطظعغفقکگلمنوہی]')
+
+@lru_cache(maxsize=1024)
+def detect(text):
+    """Detect the language of text, memoized for repeated requests"""
+    detector = get_language_factory().create()
+    detector.append(text)
+    return detector.detect()
 
 app = Flask(__name__)
 CORS(app, resources={
@@ -161,7 +194,7 @@ def detect_language():
         
         lang_map = {'en': 'English', 'ur': 'Urdu', 'hi': 'Hindi', 'ar': 'Arabic'}
         
-        if lang in ['hi', 'ar'] and any(char in text for char in 'ابتثجحخدذرزسشصضطظعغفقکگلمنوہی'):
+        if lang in ['hi', 'ar'] and URDU_CHAR_RE.search(text):
             lang = 'ur'
         
         if lang not in ['en', 'ur']:
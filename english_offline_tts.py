@@ -4,10 +4,11 @@ tts_english_offline.py
 English Offline Text-to-Speech Engine
 """
 
-import pyttsx3
 import os
 import time
-import threading
+import random
+import tts_cache
+import tts_engine
 try:
     from pydub import AudioSegment
     PYDUB_AVAILABLE = True
@@ -23,9 +24,11 @@ class EnglishOfflineTTS:
         accent: str = "us",
         gender: str = "female"
     ):
-        self.engine = pyttsx3.init()
-        self.engine.setProperty("rate", rate)
-        self.engine.setProperty("volume", volume)
+        # The engine is shared with Urdu TTS, so these settings are applied
+        # per utterance rather than once here
+        self.rate = rate
+        self.volume = volume
+        self.voice_id = None
         self._set_voice(accent, gender)
 
     def _set_voice(self, accent: str, gender: str):
@@ -37,7 +40,9 @@ class EnglishOfflineTTS:
         3. Any English voice
         4. System fallback
         """
-        voices = self.engine.getProperty("voices")
+        # Queried on the engine's worker like any other call; the engine
+        # itself may be replaced after a hung utterance, so none is kept
+        voices = tts_engine.run(lambda engine: engine.getProperty("voices"))
 
         def is_english(v):
             return "en" in str(v.languages).lower() or "english" in v.name.lower()
@@ -61,23 +66,23 @@ class EnglishOfflineTTS:
         # 1️⃣ Accent + Gender
         for v in voices:
             if is_english(v) and match_accent(v) and match_gender(v):
-                self.engine.setProperty("voice", v.id)
+                self.voice_id = v.id
                 return
 
         # 2️⃣ Accent only
         for v in voices:
             if is_english(v) and match_accent(v):
-                self.engine.setProperty("voice", v.id)
+                self.voice_id = v.id
                 return
 
         # 3️⃣ Any English
         for v in voices:
             if is_english(v):
-                self.engine.setProperty("voice", v.id)
+                self.voice_id = v.id
                 return
 
         # 4️⃣ Fallback
-        self.engine.setProperty("voice", voices[0].id)
+        self.voice_id = voices[0].id
 
     def speak(self, text: str):
         """
@@ -86,8 +91,12 @@ class EnglishOfflineTTS:
         if not text or not text.strip():
             raise ValueError("Text is empty")
 
-        self.engine.say(text)
-        self.engine.runAndWait()
+        def speak_text(engine):
+            tts_engine.configure(engine, self.rate, self.volume, self.voice_id)
+            engine.say(text)
+            engine.runAndWait()
+        
+        tts_engine.run(speak_text)
 
     def save_to_wav(self, text: str, wav_path: str):
         """
@@ -98,11 +107,15 @@ class EnglishOfflineTTS:
 
         output_dir = os.path.dirname(wav_path)
         if output_dir:
-            os.makedirs(output_dir, exist_ok=True)
+            tts_cache.ensure_dir(output_dir)
         
         print(f"Saving to WAV: {wav_path}")
-        self.engine.save_to_file(text, wav_path)
-        self.engine.runAndWait()
+        def save_text(engine):
+            tts_engine.configure(engine, self.rate, self.volume, self.voice_id)
+            engine.save_to_file(text, wav_path)
+            engine.runAndWait()
+        
+        tts_engine.run(save_text)
         
         # Verify file was created
         if not os.path.exists(wav_path):
@@ -131,6 +144,17 @@ class EnglishOfflineTTS:
 
 # ---------- Integration-Friendly Function ----------
 
+def _english_voice_id(engine):
+    """Pick the first English voice, falling back to the first installed one"""
+    voices = engine.getProperty("voices")
+    if not voices:
+        return None
+    for voice in voices:
+        if voice and hasattr(voice, 'languages'):
+            if 'en' in str(voice.languages).lower():
+                return voice.id
+    return voices[0].id
+
 def generate_english_offline_tts(
     text: str,
     output_file: str = "output/english_offline.mp3",
@@ -144,44 +168,19 @@ def generate_english_offline_tts(
     if not text or not text.strip():
         raise ValueError("Input text cannot be empty")
     
+    if not tts_engine.PYTTSX3_AVAILABLE:
+        raise RuntimeError("Offline mode unavailable: pyttsx3 is not installed")
+    
     output_dir = os.path.dirname(output_file)
     if output_dir:
-        os.makedirs(output_dir, exist_ok=True)
+        tts_cache.ensure_dir(output_dir)
     
     last_error = None
     
     for attempt in range(max_retries):
-        engine = None
         wav_file = None
         
         try:
-            # Initialize engine with error handling
-            import pyttsx3
-            engine = pyttsx3.init()
-            
-            if not engine:
-                raise Exception("Failed to initialize TTS engine")
-            
-            # Configure engine settings
-            engine.setProperty("rate", 180)
-            engine.setProperty("volume", 1.0)
-            
-            # Set voice with fallback
-            voices = engine.getProperty("voices")
-            if voices and len(voices) > 0:
-                # Try to find English voice
-                english_voice = None
-                for voice in voices:
-                    if voice and hasattr(voice, 'languages'):
-                        if 'en' in str(voice.languages).lower():
-                            english_voice = voice
-                            break
-                
-                if english_voice:
-                    engine.setProperty("voice", english_voice.id)
-                else:
-                    engine.setProperty("voice", voices[0].id)
-            
             # Determine output file path
             if output_file.endswith(".mp3"):
                 wav_file = output_file.replace(".mp3", ".wav")
@@ -189,33 +188,16 @@ def generate_english_offline_tts(
                 wav_file = output_file
             
             # Generate audio with timeout protection
-            import threading
-            import time
+            def generate_audio(engine):
+                # Configure engine settings; Urdu TTS may have changed them
+                tts_engine.configure(engine, 180, 1.0, _english_voice_id(engine))
+                engine.save_to_file(text, wav_file)
+                engine.runAndWait()
             
-            generation_complete = threading.Event()
-            generation_error = None
-            
-            def generate_audio():
-                nonlocal generation_error
-                try:
-                    engine.save_to_file(text, wav_file)
-                    engine.runAndWait()
-                    generation_complete.set()
-                except Exception as e:
-                    generation_error = e
-                    generation_complete.set()
-            
-            # Start generation in separate thread
-            thread = threading.Thread(target=generate_audio)
-            thread.daemon = True
-            thread.start()
-            
-            # Wait with timeout (30 seconds)
-            if not generation_complete.wait(timeout=30):
-                raise Exception("TTS generation timeout")
-            
-            if generation_error:
-                raise generation_error
+            # Wait with timeout (30 seconds); errors from the worker re-raise here.
+            # A synthesis that hangs is abandoned with its worker and engine, so
+            # the next request starts on a fresh one instead of queueing behind it
+            tts_engine.run(generate_audio, timeout=30)
             
             # Validate generated file
             if not os.path.exists(wav_file):
@@ -240,16 +222,9 @@ def generate_english_offline_tts(
                 except:
                     pass
             
-            # Clean up engine
-            if engine:
-                try:
-                    engine.stop()
-                except:
-                    pass
-            
-            # Wait before retry
+            # Wait before retry (exponential backoff with jitter: ~0.1, 0.2, 0.4s, capped at 2s)
             if attempt < max_retries - 1:
-                time.sleep(1)
+                time.sleep(min(2.0, 0.1 * (2 ** attempt)) * random.uniform(0.8, 1.2))
     
     # All retries failed
     raise Exception(f"Offline TTS failed after {max_retries} attempts: {str(last_error)}")
@@ -0,0 +1,88 @@
+"""
+OCR Result Cache Module
+Stores extracted text on disk keyed by a hash of the source file bytes
+"""
+
+import os
+import time
+import hashlib
+import uuid
+import itertools
+from typing import Optional
+
+CACHE_DIR = ".ocr_cache"
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+# Entries older than this are re-extracted
+TTL_SECONDS = 30 * 24 * 60 * 60
+# Expired entries are also swept from disk on the first put and every
+# SWEEP_EVERY puts after it, so keys never looked up again do not pile up
+SWEEP_EVERY = 100
+# Temp files older than this are leftovers of interrupted writes
+STALE_TEMP_SECONDS = 60 * 60
+
+_put_count = itertools.count()
+
+def file_key(path: str, *params) -> str:
+    """
+    Hash the file contents in 1 MiB chunks so large files are never fully loaded;
+    params must cover every setting that changes the extracted text
+    """
+    digest = hashlib.sha1()
+    digest.update("|".join(str(p) for p in params).encode('utf-8') + b'\0')
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _cache_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.txt")
+
+def get(key: str) -> Optional[str]:
+    """Return cached text for a file key, or None on a miss or expired entry"""
+    cache_path = _cache_path(key)
+    try:
+        if time.time() - os.path.getmtime(cache_path) > TTL_SECONDS:
+            os.remove(cache_path)
+            return None
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+def sweep() -> None:
+    """Remove expired entries and stale temp files from the cache (best effort)"""
+    now = time.time()
+    try:
+        shards = [entry.path for entry in os.scandir(CACHE_DIR) if entry.is_dir()]
+    except OSError:
+        return
+    for shard in shards:
+        try:
+            entries = list(os.scandir(shard))
+        except OSError:
+            continue
+        for entry in entries:
+            max_age = STALE_TEMP_SECONDS if entry.name.endswith('.tmp') else TTL_SECONDS
+            try:
+                if now - entry.stat().st_mtime > max_age:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+def put(key: str, text: str) -> None:
+    """Store extracted text for a file key (best effort)"""
+    if next(_put_count) % SWEEP_EVERY == 0:
+        sweep()
+    cache_path = _cache_path(key)
+    temp_path = f"{cache_path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        # Atomic rename so readers never see a partially written entry
+        os.replace(temp_path, cache_path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
@@ -7,28 +7,89 @@ import os
 import tempfile
 import re
 import html
-from typing import Optional
+import importlib.util
+import stat
+from functools import partial
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+import ocr_cache
+
+# Urdu alphabet shared by the OCR clean-up patterns below
+_URDU = "اآبپتٹثجچحخدڈذرڑزژسشصضطظعغفقکگلمنںوہھیے"
+
+# Pre-compiled clean-up patterns so repeated calls don't go through the re cache
+_SINGLE_CHAR_RE = re.compile(rf'\b[a-zA-Z]\b(?!\s+[{_URDU}])')
+_MIXED_LANG_RE = re.compile(rf'\b[a-zA-Z]{{1,2}}\s+(?=[{_URDU}])')
+_STRAY_NUMBER_RE = re.compile(rf'\b\d{{1,2}}\b(?=\s+[{_URDU}])')
+_NOISE_RES = [
+    re.compile(pattern, re.IGNORECASE) for pattern in (
+        r'\b(br|Fe|we|ei|Sule|بی گی)\b',  # Common OCR misreads
+        r'\([^)]*\)',  # Remove parenthetical content that's often noise
+        r'[{}\[\]<>]',  # Remove brackets and braces
+        r'\s+[-_=+*#@$%^&]+\s+',  # Remove lines of special characters
+        r'\b[a-zA-Z]+(\d+[a-zA-Z]*)+\b',  # Remove alphanumeric codes
+    )
+]
+_WS_RE = re.compile(r'\s+')
+_URDU_COUNT_RE = re.compile(f'[{_URDU}]')
+_LETTER_COUNT_RE = re.compile(f'[a-zA-Z{_URDU}]')
+_SHORT_ENGLISH_RE = re.compile(r'\b[a-zA-Z]{1,3}\b')
+
+# Let callers' worker threads own the cores instead of tesseract's OpenMP pool
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+# Known tesseract install locations, in order of preference
+TESSERACT_PATHS = [
+    r'D:\tesercat\tesseract.exe',
+    r'C:\Program Files\Tesseract-OCR\tesseract.exe',
+    r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe'
+]
+
+def _find_tesseract_cmd() -> Optional[str]:
+    """Resolve the tesseract executable once instead of on every OCR call"""
+    for path in TESSERACT_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+TESSERACT_CMD = _find_tesseract_cmd()
+
+# Hamza forms (as in لئے, گئی, ہوئے), teh marbuta goal and Urdu punctuation (full
+# stop, comma, question mark, semicolon); kept out of _URDU, which the clean-up
+# patterns use as the letter set
+_URDU_EXTRA = "ءئؤۓۃۂ۔،؟؛"
+
+# Urdu + English with character whitelist. pytesseract shlex-splits the config,
+# so the whitelist must hold no spaces or quotes; word gaps are still emitted
+OCR_WHITELIST = _URDU + _URDU_EXTRA + 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.,!?;:()-'
+OCR_CONFIG = '--psm 6 -c tessedit_char_whitelist=' + OCR_WHITELIST
+
+# Bump when extraction or clean-up logic changes so cached text is not reused
+EXTRACTOR_VERSION = 2
+
+# Image formats tesseract decodes itself, so no PIL re-encode is needed
+TESSERACT_NATIVE_FORMATS = {'JPEG', 'PNG', 'BMP', 'TIFF'}
+
+# Images per tesseract list-file run in extract_text_from_images
+IMAGE_LIST_CHUNK_SIZE = 100
 
 def extract_text_from_pdf(file_path: str) -> str:
     """Extract text from PDF files"""
     try:
         import PyPDF2
-        text = ""
+        # Collect all pages first and join once instead of re-copying the
+        # accumulated string for every page
         with open(file_path, 'rb') as file:
             pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-        return text.strip()
+            pages = [page.extract_text() or "" for page in pdf_reader.pages]
+        return "\n".join(pages).strip()
     except ImportError:
         try:
             import pdfplumber
-            text = ""
             with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-            return text.strip()
+                pages = [page.extract_text() for page in pdf.pages]
+            return "\n".join(page_text for page_text in pages if page_text).strip()
         except ImportError:
             raise ImportError("Please install PyPDF2 or pdfplumber: pip install PyPDF2 pdfplumber")
 
@@ -64,25 +125,9 @@ def extract_text_from_image(file_path: str) -> str:
         import pytesseract
         from PIL import Image
         
-        # Configure tesseract path explicitly
-        tesseract_path = r'D:\tesercat\tesseract.exe'
-        if os.path.exists(tesseract_path):
-            pytesseract.pytesseract.tesseract_cmd = tesseract_path
-        else:
-            # Fallback to common Windows paths
-            possible_paths = [
-                r'C:\Program Files\Tesseract-OCR\tesseract.exe',
-                r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe'
-            ]
-            tesseract_found = False
-            for path in possible_paths:
-                if os.path.exists(path):
-                    pytesseract.pytesseract.tesseract_cmd = path
-                    tesseract_found = True
-                    break
-            
-            if not tesseract_found:
-                raise Exception(f"Tesseract not found at {tesseract_path} or standard locations")
+        if not TESSERACT_CMD:
+            raise Exception(f"Tesseract not found at {TESSERACT_PATHS[0]} or standard locations")
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
         
         # Open and validate image
         try:
@@ -101,46 +146,32 @@ def extract_text_from_image(file_path: str) -> str:
             # Convert any other mode to RGB
             image = image.convert('RGB')
         
-        # Try multiple language combinations for better text detection
-        language_configs = [
-            ('urd+eng', '--psm 6 -c tessedit_char_whitelist=اآبپتٹثجچحخدڈذرڑزژسشصضطظعغفقکگلمنںوہھیے abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.,!?;:()"\'-'),  # Urdu + English with character whitelist
-            ('urd', '--psm 6 -c tessedit_char_whitelist=اآبپتٹثجچحخدڈذرڑزژسشصضطظعغفقکگلمنںوہھیے .,!?;:()"\'-'),      # Urdu only with whitelist
-            ('urd+eng', '--psm 6'),  # Urdu + English fallback
-            ('eng+urd', '--psm 6'),  # English + Urdu fallback
-        ]
+        # Files tesseract can read as-is are handed over by path; passing a PIL
+        # image makes pytesseract re-encode it to a temporary PNG first
+        if image.format in TESSERACT_NATIVE_FORMATS:
+            image.close()
+            ocr_input = file_path
+        else:
+            ocr_input = image
         
-        best_text = ""
-        best_confidence = 0
+        # One tesseract run gives both the words and their confidences
+        data = pytesseract.image_to_data(ocr_input, lang='urd+eng', config=OCR_CONFIG, output_type=pytesseract.Output.DICT)
         
-        for lang, config in language_configs:
-            try:
-                # Extract text with current language configuration
-                text = pytesseract.image_to_string(image, lang=lang, config=config)
-                
-                if text and text.strip():
-                    # Get confidence score
-                    try:
-                        data = pytesseract.image_to_data(image, lang=lang, config=config, output_type=pytesseract.Output.DICT)
-                        confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-                        avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-                        
-                        if avg_confidence > best_confidence:
-                            best_confidence = avg_confidence
-                            best_text = text
-                    except:
-                        # If confidence calculation fails, use text length as a heuristic
-                        if len(text.strip()) > len(best_text.strip()):
-                            best_text = text
-                            
-            except Exception as e:
-                # Continue with next language configuration
+        # Rebuild the text line by line from confidently recognised words
+        lines = {}
+        for i, word in enumerate(data['text']):
+            if not word or not word.strip() or float(data['conf'][i]) <= 0:
                 continue
+            line_key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            lines.setdefault(line_key, []).append(word)
         
-        if not best_text or not best_text.strip():
-            raise Exception("No text detected in image with any language configuration")
+        text = "\n".join(" ".join(words) for words in lines.values())
+        
+        if not text.strip():
+            raise Exception("No text detected in image")
         
         # Clean and normalize the extracted text
-        cleaned_text = clean_extracted_text(best_text)
+        cleaned_text = clean_extracted_text(text)
         
         return cleaned_text
     except ImportError:
@@ -148,6 +179,49 @@ def extract_text_from_image(file_path: str) -> str:
     except Exception as e:
         raise Exception(f"OCR failed: {str(e)}")
 
+def _ocr_image_list(paths: List[str]) -> str:
+    """Run a single tesseract process over several images using its list-file input"""
+    import pytesseract
+    
+    list_file = tempfile.NamedTemporaryFile('w', suffix='.txt', encoding='utf-8', delete=False)
+    try:
+        with list_file:
+            list_file.write("\n".join(os.path.abspath(path) for path in paths))
+        return pytesseract.image_to_string(list_file.name, lang='urd+eng', config=OCR_CONFIG)
+    finally:
+        os.remove(list_file.name)
+
+def extract_text_from_images(paths: List[str]) -> str:
+    """Extract text from a batch of images, amortizing tesseract start-up across them"""
+    try:
+        import pytesseract
+        
+        if not paths:
+            return ""
+        
+        if not TESSERACT_CMD:
+            raise Exception(f"Tesseract not found at {TESSERACT_PATHS[0]} or standard locations")
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+        
+        # Long list files are known to hang tesseract, so shard them
+        chunks = [paths[i:i + IMAGE_LIST_CHUNK_SIZE] for i in range(0, len(paths), IMAGE_LIST_CHUNK_SIZE)]
+        if len(chunks) == 1:
+            texts = [_ocr_image_list(chunks[0])]
+        else:
+            max_workers = max(1, (os.cpu_count() or 1) // 4)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                texts = list(executor.map(_ocr_image_list, chunks))
+        
+        text = "\n".join(texts)
+        if not text.strip():
+            raise Exception("No text detected in images")
+        
+        return clean_extracted_text(text)
+    except ImportError:
+        raise ImportError("Please install pytesseract and Pillow: pip install pytesseract Pillow")
+    except Exception as e:
+        raise Exception(f"OCR failed: {str(e)}")
+
 def extract_text_from_doc(file_path: str) -> str:
     """Extract text from DOC files (legacy Word format)"""
     try:
@@ -165,49 +239,64 @@ def extract_text_from_doc(file_path: str) -> str:
         except ImportError:
             raise ImportError("Please install docx2txt: pip install docx2txt")
 
+def _extract_with_cache(extractor, file_path: str) -> str:
+    """Run an expensive extractor, reusing the result for identical file contents"""
+    # Key on the extractor and its settings too, so a config change re-extracts
+    key = ocr_cache.file_key(file_path, extractor.__name__, EXTRACTOR_VERSION, OCR_CONFIG)
+    cached = ocr_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    text = extractor(file_path)
+    if text and text.strip():
+        ocr_cache.put(key, text)
+    return text
+
+def extract_text_from_txt(file_path: str) -> str:
+    """Read plain text files, trying common encodings"""
+    encodings = ['utf-8', 'utf-16', 'latin-1', 'cp1252']
+    for encoding in encodings:
+        try:
+            with open(file_path, 'r', encoding=encoding, errors='replace') as f:
+                return f.read()
+        except UnicodeDecodeError:
+            continue
+    raise Exception("Could not decode text file with any supported encoding")
+
+# Extension -> extractor; the slow PDF and OCR paths go through the content cache
+_DISPATCH = {
+    '.txt': extract_text_from_txt,
+    '.pdf': partial(_extract_with_cache, extract_text_from_pdf),
+    '.docx': extract_text_from_docx,
+    '.doc': extract_text_from_doc,
+    '.pptx': extract_text_from_pptx,
+    **{ext: partial(_extract_with_cache, extract_text_from_image)
+       for ext in ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.webp')},
+}
+
 def extract_text_from_file(file_path: str, file_extension: str) -> str:
     """
     Main function to extract text from various file types
     """
     file_extension = file_extension.lower()
     
-    # Validate file path
-    if not os.path.exists(file_path) or not os.path.isfile(file_path):
+    # Validate file path with a single stat call
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        raise ValueError("Invalid file path")
+    if not stat.S_ISREG(file_stat.st_mode):
         raise ValueError("Invalid file path")
     
     # Check file size (max 50MB)
-    if os.path.getsize(file_path) > 50 * 1024 * 1024:
+    if file_stat.st_size > 50 * 1024 * 1024:
         raise ValueError("File too large")
     
     try:
-        if file_extension == '.txt':
-            # Try different encodings
-            encodings = ['utf-8', 'utf-16', 'latin-1', 'cp1252']
-            for encoding in encodings:
-                try:
-                    with open(file_path, 'r', encoding=encoding, errors='replace') as f:
-                        return f.read()
-                except UnicodeDecodeError:
-                    continue
-            raise Exception("Could not decode text file with any supported encoding")
-        
-        elif file_extension == '.pdf':
-            return extract_text_from_pdf(file_path)
-        
-        elif file_extension == '.docx':
-            return extract_text_from_docx(file_path)
-        
-        elif file_extension == '.doc':
-            return extract_text_from_doc(file_path)
-        
-        elif file_extension == '.pptx':
-            return extract_text_from_pptx(file_path)
-        
-        elif file_extension in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif', '.webp']:
-            return extract_text_from_image(file_path)
-        
-        else:
+        extractor = _DISPATCH.get(file_extension)
+        if extractor is None:
             raise ValueError(f"Unsupported file type: {file_extension}")
+        return extractor(file_path)
     
     except ImportError as e:
         # Re-raise ImportError to be handled by the caller
@@ -225,84 +314,65 @@ def clean_extracted_text(text: str) -> str:
     
     # Remove common OCR artifacts and noise
     # Remove standalone single characters that are likely OCR errors
-    text = re.sub(r'\b[a-zA-Z]\b(?!\s+[اآبپتٹثجچحخدڈذرڑزژسشصضطظعغفقکگلمنںوہھیے])', '', text)
+    text = _SINGLE_CHAR_RE.sub('', text)
     
     # Remove mixed language artifacts (English chars mixed with Urdu)
     # Keep only if they form meaningful words
-    text = re.sub(r'\b[a-zA-Z]{1,2}\s+(?=[اآبپتٹثجچحخدڈذرڑزژسشصضطظعغفقکگلمنںوہھیے])', '', text)
+    text = _MIXED_LANG_RE.sub('', text)
     
     # Remove standalone numbers that are OCR artifacts
-    text = re.sub(r'\b\d{1,2}\b(?=\s+[اآبپتٹثجچحخدڈذرڑزژسشصضطظعغفقکگلمنںوہھیے])', '', text)
+    text = _STRAY_NUMBER_RE.sub('', text)
     
     # Remove common OCR noise patterns
-    noise_patterns = [
-        r'\b(br|Fe|we|ei|Sule|بی گی)\b',  # Common OCR misreads
-        r'\([^)]*\)',  # Remove parenthetical content that's often noise
-        r'[{}\[\]<>]',  # Remove brackets and braces
-        r'\s+[-_=+*#@$%^&]+\s+',  # Remove lines of special characters
-        r'\b[a-zA-Z]+(\d+[a-zA-Z]*)+\b',  # Remove alphanumeric codes
-    ]
-    
-    for pattern in noise_patterns:
-        text = re.sub(pattern, ' ', text, flags=re.IGNORECASE)
+    for noise_re in _NOISE_RES:
+        text = noise_re.sub(' ', text)
     
     # Clean up whitespace
-    text = re.sub(r'\s+', ' ', text)  # Multiple spaces to single space
+    text = _WS_RE.sub(' ', text)  # Multiple spaces to single space
     text = text.strip()
     
     # If text is mostly Urdu, remove remaining English artifacts
-    urdu_chars = len(re.findall(r'[اآبپتٹثجچحخدڈذرڑزژسشصضطظعغفقکگلمنںوہھیے]', text))
-    total_chars = len(re.findall(r'[a-zA-Zاآبپتٹثجچحخدڈذرڑزژسشصضطظعغفقکگلمنںوہھیے]', text))
+    urdu_chars = len(_URDU_COUNT_RE.findall(text))
+    total_chars = len(_LETTER_COUNT_RE.findall(text))
     
     if total_chars > 0 and urdu_chars / total_chars > 0.6:  # If 60% Urdu
         # Remove remaining English words that are likely OCR errors
-        text = re.sub(r'\b[a-zA-Z]{1,3}\b', '', text)
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = _SHORT_ENGLISH_RE.sub('', text)
+        text = _WS_RE.sub(' ', text).strip()
     
     return text
 
-def get_supported_extensions():
-    """Return list of supported file extensions based on available packages"""
+def _has_module(name: str) -> bool:
+    """Check whether a package is installed without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+def _detect_supported_extensions():
+    """Work out the supported file extensions from the installed packages"""
     base_extensions = {'txt'}  # Always supported
     
     # Check for optional packages and add extensions if available
-    try:
-        import PyPDF2
+    if _has_module('PyPDF2') or _has_module('pdfplumber'):
         base_extensions.add('pdf')
-    except ImportError:
-        try:
-            import pdfplumber
-            base_extensions.add('pdf')
-        except ImportError:
-            pass
     
-    try:
-        from docx import Document
+    if _has_module('docx'):
         base_extensions.add('docx')
-    except ImportError:
-        pass
     
-    try:
-        import textract
+    if _has_module('textract') or _has_module('docx2txt'):
         base_extensions.add('doc')
-    except ImportError:
-        try:
-            import docx2txt
-            base_extensions.add('doc')
-        except ImportError:
-            pass
     
-    try:
-        from pptx import Presentation
+    if _has_module('pptx'):
         base_extensions.add('pptx')
-    except ImportError:
-        pass
     
-    try:
-        import pytesseract
-        from PIL import Image
+    if _has_module('pytesseract') and _has_module('PIL'):
         base_extensions.update(['jpg', 'jpeg', 'png', 'bmp', 'tiff', 'tif', 'webp'])
-    except ImportError:
-        pass
     
-    return base_extensions
\ No newline at end of file
+    return frozenset(base_extensions)
+
+_SUPPORTED_EXTENSIONS = _detect_supported_extensions()
+
+def get_supported_extensions():
+    """Return list of supported file extensions based on available packages"""
+    return _SUPPORTED_EXTENSIONS
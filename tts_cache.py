@@ -0,0 +1,317 @@
+"""
+TTS Audio Cache Module
+Content-hash keyed audio cache shared by the English and Urdu TTS engines
+"""
+
+import os
+import json
+import atexit
+import time
+import hashlib
+import shutil
+import threading
+from typing import Optional
+
+# Shared audio cache, laid out as CACHE_DIR/{lang}/{h[:2]}/{h}{ext}
+CACHE_DIR = "tts_cache"
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+# Byte budget for the whole cache; least recently used entries are evicted
+MAX_CACHE_BYTES = 100 * 1024 * 1024
+# Entries older than this are dropped regardless of use
+TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Per-engine cache directories from before the shared cache; nothing reads
+# them any more, so they are removed on first use
+LEGACY_CACHE_DIRS = ("tts_cache_english",)
+
+# Sidecar index: path -> {"size", "atime", "created"}
+INDEX_FILE = os.path.join(CACHE_DIR, "cache_index.json")
+
+# Index writes are batched: at most one per interval, plus evictions and exit
+INDEX_SAVE_INTERVAL = 5
+# Eviction frees space down to this fraction of the budget
+EVICT_TARGET_FRACTION = 0.9
+# Temp files older than this are leftovers of interrupted writes
+STALE_TEMP_SECONDS = 60 * 60
+
+cache_lock = threading.Lock()
+_index = None
+_total_bytes = 0
+_dirty = False
+_last_save = 0.0
+
+# Directories already created by this process
+_ensured_dirs = set()
+
+def ensure_dir(path: str) -> None:
+    """
+    Create a directory once per process; later calls skip the mkdir syscalls
+    """
+    if path not in _ensured_dirs:
+        os.makedirs(path, exist_ok=True)
+        _ensured_dirs.add(path)
+
+def generate_cache_key(text: str, *params) -> str:
+    """
+    Generates a unique hash key for caching TTS responses; params must cover
+    every setting that changes the synthesized audio (language, mode, speed...)
+    """
+    prefix = "|".join(str(p) for p in params)
+    # 128-bit BLAKE2b: faster than SHA-2 and a short, filesystem-friendly key
+    return hashlib.blake2b(f"{prefix}|{text}".encode("utf-8"), digest_size=16).hexdigest()
+
+def cache_path(cache_key: str, lang: str, ext: str = ".mp3") -> str:
+    """
+    Location of a cached audio file, sharded by language and key prefix
+    """
+    return os.path.join(CACHE_DIR, lang, cache_key[:2], f"{cache_key}{ext}")
+
+def prepare_output(*paths: str) -> None:
+    """
+    Unlink output paths before a synthesis writes to them. A path may still be
+    a hard or symbolic link into the cache from an earlier hit or store, and
+    writing through it in place would overwrite the cached audio
+    """
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+def fast_clone(src: str, dst: str, allow_symlink: bool = True) -> None:
+    """
+    Make dst hold the same audio as src, avoiding a byte copy when possible:
+    hardlink first, then symlink, then an atomic copy. Whatever dst held
+    before is unlinked, never written in place
+    """
+    prepare_output(dst)
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+    if allow_symlink:
+        try:
+            os.symlink(os.path.abspath(src), dst)
+            return
+        except OSError:
+            pass
+    temp_dst = f"{dst}.tmp"
+    shutil.copyfile(src, temp_dst)
+    os.replace(temp_dst, dst)
+
+def _scan_files():
+    """
+    Yield (path, stat) for every file under CACHE_DIR/{lang}/{shard}/, using
+    the same path form as cache_path() so results match index keys
+    """
+    for lang_dir in os.scandir(CACHE_DIR):
+        if not lang_dir.is_dir():
+            continue
+        for shard_dir in os.scandir(lang_dir.path):
+            if not shard_dir.is_dir():
+                continue
+            for entry in os.scandir(shard_dir.path):
+                if entry.is_file():
+                    yield entry.path, entry.stat()
+
+def _load_index() -> dict:
+    """
+    Load the index on first use and reconcile it against the directory:
+    entries whose files are gone are dropped, files the index never recorded
+    (stored before the index existed, or by a run whose index save was lost)
+    are adopted, and leftover temp files are removed. Expired entries are
+    then dropped. Caller must hold cache_lock
+    """
+    global _index, _total_bytes
+    if _index is None:
+        for legacy_dir in LEGACY_CACHE_DIRS:
+            shutil.rmtree(legacy_dir, ignore_errors=True)
+        try:
+            with open(INDEX_FILE, "r", encoding="utf-8") as f:
+                _index = json.load(f)
+        except (OSError, ValueError):
+            _index = {}
+        now = time.time()
+        
+        on_disk = {}
+        try:
+            for path, st in _scan_files():
+                if path.endswith(".tmp"):
+                    if now - st.st_mtime > STALE_TEMP_SECONDS:
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                    continue
+                on_disk[path] = st
+        except OSError:
+            pass
+        
+        for path in list(_index):
+            if path not in on_disk:
+                del _index[path]
+        for path, st in on_disk.items():
+            if path not in _index:
+                # Age adopted files from their mtime so old ones still expire
+                _index[path] = {"size": st.st_size, "atime": st.st_mtime, "created": st.st_mtime}
+        
+        _total_bytes = sum(entry["size"] for entry in _index.values())
+        for path, entry in list(_index.items()):
+            if now - entry["created"] > TTL_SECONDS:
+                _remove_entry(path)
+        if _total_bytes > MAX_CACHE_BYTES:
+            _evict()
+        _save_index()
+    return _index
+
+def _save_index() -> None:
+    """
+    Persist the index atomically. Caller must hold cache_lock
+    """
+    global _dirty, _last_save
+    _dirty = False
+    _last_save = time.monotonic()
+    temp_index = f"{INDEX_FILE}.tmp"
+    try:
+        with open(temp_index, "w", encoding="utf-8") as f:
+            json.dump(_index, f)
+        os.replace(temp_index, INDEX_FILE)
+    except OSError:
+        pass
+
+def _mark_dirty() -> None:
+    """
+    Note an index change, saving only if INDEX_SAVE_INTERVAL has passed since
+    the last save. Caller must hold cache_lock
+    """
+    global _dirty
+    _dirty = True
+    if time.monotonic() - _last_save >= INDEX_SAVE_INTERVAL:
+        _save_index()
+
+def flush() -> None:
+    """Write out pending index changes; registered to run at exit"""
+    with cache_lock:
+        if _dirty and _index is not None:
+            _save_index()
+
+atexit.register(flush)
+
+def _remove_entry(path: str) -> None:
+    """
+    Drop an entry from the index and disk. Caller must hold cache_lock
+    """
+    global _total_bytes
+    entry = _index.pop(path, None)
+    if entry is not None:
+        _total_bytes -= entry["size"]
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _evict(keep: Optional[str] = None) -> None:
+    """
+    Evict least recently used entries until the cache is down to
+    EVICT_TARGET_FRACTION of MAX_CACHE_BYTES, so the next inserts fit without
+    another sort. Caller must hold cache_lock
+    """
+    target = MAX_CACHE_BYTES * EVICT_TARGET_FRACTION
+    for old_path, entry in sorted(_index.items(), key=lambda item: item[1]["atime"]):
+        if _total_bytes <= target:
+            break
+        if old_path != keep:
+            _remove_entry(old_path)
+
+def _record_insert(path: str) -> None:
+    """
+    Index a newly stored file, evicting least recently used entries once the
+    cache exceeds MAX_CACHE_BYTES. Caller must hold cache_lock
+    """
+    global _total_bytes
+    index = _load_index()
+    now = time.time()
+    old = index.get(path)
+    if old is not None:
+        _total_bytes -= old["size"]
+    size = os.path.getsize(path)
+    index[path] = {"size": size, "atime": now, "created": now}
+    _total_bytes += size
+    
+    if _total_bytes > MAX_CACHE_BYTES:
+        _evict(keep=path)
+        # Evicted files are gone from disk; record that right away
+        _save_index()
+    else:
+        _mark_dirty()
+
+def lookup(cache_key: str, lang: str, exts=(".mp3",)) -> Optional[str]:
+    """
+    Return the path of a cached, non-empty audio file for the key, if any,
+    marking it as recently used
+    """
+    global _total_bytes, _dirty
+    for ext in exts:
+        path = cache_path(cache_key, lang, ext)
+        if not (os.path.exists(path) and os.path.getsize(path) > 0):
+            continue
+        with cache_lock:
+            index = _load_index()
+            entry = index.get(path)
+            now = time.time()
+            if entry is None:
+                if not os.path.exists(path):
+                    # Expired and removed while loading the index
+                    continue
+                # Stored by another process since the index was loaded
+                size = os.path.getsize(path)
+                index[path] = {"size": size, "atime": now, "created": now}
+                _total_bytes += size
+                _mark_dirty()
+            elif now - entry["created"] > TTL_SECONDS:
+                _remove_entry(path)
+                _mark_dirty()
+                continue
+            else:
+                # Hit times are persisted with the next index save
+                entry["atime"] = now
+                _dirty = True
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return path
+    return None
+
+def store(audio_file: str, cache_key: str, lang: str) -> None:
+    """
+    Add a freshly generated audio file to the cache (best effort)
+    """
+    path = cache_path(cache_key, lang, os.path.splitext(audio_file)[1])
+    with cache_lock:
+        try:
+            ensure_dir(os.path.dirname(path))
+            # Never symlink here: the generated file is deleted after streaming
+            fast_clone(audio_file, path, allow_symlink=False)
+            _record_insert(path)
+        except OSError:
+            pass
+
+def store_bytes(audio: bytes, cache_key: str, lang: str, ext: str = ".mp3") -> None:
+    """
+    Add in-memory audio to the cache (best effort)
+    """
+    path = cache_path(cache_key, lang, ext)
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        ensure_dir(os.path.dirname(path))
+        with open(temp_path, "wb") as f:
+            f.write(audio)
+        # Publish atomically so concurrent readers never see a partial file
+        os.replace(temp_path, path)
+        with cache_lock:
+            _record_insert(path)
+    except OSError:
+        pass
@@ -0,0 +1,125 @@
+"""
+Shared Offline Engine Module
+Technology: one pyttsx3 engine shared by the English and Urdu offline TTS engines
+"""
+
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+try:
+    import pyttsx3
+    PYTTSX3_AVAILABLE = True
+except ImportError:
+    pyttsx3 = None
+    PYTTSX3_AVAILABLE = False
+
+_engine_lock = threading.Lock()
+_engine = None
+
+# pyttsx3 engines are not re-entrant and every caller shares the one engine,
+# so one utterance (in any language) is synthesized at a time.
+# Rate, volume and voice are applied per utterance while this is held; it is
+# taken before submitting, so queue time never counts against a timeout
+synthesis_lock = threading.Lock()
+
+def _start_worker():
+    """
+    Start the long-lived thread every synthesis runs on and return its job
+    queue. It is a daemon rather than a ThreadPoolExecutor worker: those are
+    joined at interpreter exit, so one stuck in synthesis would block shutdown
+    """
+    jobs = queue.SimpleQueue()
+    
+    def work():
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            future, fn = job
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn())
+                except BaseException as e:
+                    future.set_exception(e)
+    
+    threading.Thread(target=work, name="pyttsx3", daemon=True).start()
+    return jobs
+
+# Job queue of the current worker; replaced if a synthesis hangs past its timeout
+_jobs = _start_worker()
+
+def get_engine():
+    """Create the pyttsx3 engine once and reuse it; init costs hundreds of ms"""
+    global _engine
+    if not PYTTSX3_AVAILABLE:
+        raise RuntimeError("Offline mode unavailable: pyttsx3 is not installed")
+    with _engine_lock:
+        if _engine is None:
+            # A private engine rather than pyttsx3.init()'s per-driver cache,
+            # which would hand back an engine abandoned by _replace_worker
+            engine = pyttsx3.Engine()
+            if not engine:
+                raise Exception("Failed to initialize TTS engine")
+            _engine = engine
+        return _engine
+
+def configure(engine, rate: int, volume: float = 1.0, voice_id=None) -> None:
+    """
+    Apply one caller's settings to the shared engine; another language may
+    have changed them since. Call from inside a run() task
+    """
+    engine.setProperty("rate", rate)
+    engine.setProperty("volume", volume)
+    if voice_id:
+        engine.setProperty("voice", voice_id)
+
+# How often a cancellable run() rechecks its event while waiting for the engine
+LOCK_POLL_SECONDS = 0.05
+
+def run(task, timeout=None, cancel_event=None):
+    """
+    Run task(engine) on the engine's worker thread, one utterance at a time,
+    and return its result. Errors raised by the task re-raise here. If
+    cancel_event is set while waiting for the engine, the task never runs.
+
+    Tasks should end with engine.runAndWait(): it queues endLoop behind the
+    pending save/say, so it returns once the audio is done on every driver.
+    SAPI5 never sends 'finished-utterance' for save_to_file, so waiting for
+    that event is not an option
+    """
+    if cancel_event is None:
+        synthesis_lock.acquire()
+    else:
+        while not synthesis_lock.acquire(timeout=LOCK_POLL_SECONDS):
+            if cancel_event.is_set():
+                raise Exception("Offline TTS cancelled")
+    try:
+        if cancel_event is not None and cancel_event.is_set():
+            raise Exception("Offline TTS cancelled")
+        future = Future()
+        _jobs.put((future, lambda: task(get_engine())))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            _replace_worker()
+            raise Exception("Offline TTS generation timeout")
+    finally:
+        synthesis_lock.release()
+
+def _replace_worker():
+    """
+    Abandon a worker stuck in synthesis along with its engine. stop() cannot
+    be relied on to free it: SAPI5 ignores it for save_to_file, which never
+    marks the engine as speaking. Caller must hold synthesis_lock
+    """
+    global _jobs, _engine
+    with _engine_lock:
+        engine, _engine = _engine, None
+    if engine is not None:
+        try:
+            engine.stop()
+        except Exception:
+            pass
+    # The stuck thread exits once synthesis returns, if it ever does
+    _jobs.put(None)
+    _jobs = _start_worker()
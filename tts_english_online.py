@@ -4,30 +4,26 @@ Technology: gTTS (Google Text-to-Speech)
 """
 
 import os
-import hashlib
-from gtts import gTTS
-import threading
 import time
-import requests
+import tts_cache
+from tts_session import check_internet_connection, fetch_mp3, save_mp3
 
-CACHE_DIR = "tts_cache_english"
-os.makedirs(CACHE_DIR, exist_ok=True)
-
-cache_lock = threading.Lock()
-
-def _generate_cache_key(text: str) -> str:
+def _synthesize_chunk(chunk: str, slow: bool, timeout: int) -> bytes:
     """
-    Generates a unique hash key for caching TTS responses
+    Synthesize one chunk to MP3 bytes, reusing and filling the per-chunk cache
     """
-    return hashlib.md5(text.encode("utf-8")).hexdigest()
+    cache_key = tts_cache.generate_cache_key(chunk, "en", int(slow))
+    cached_file = tts_cache.lookup(cache_key, "en")
+    if cached_file:
+        with open(cached_file, "rb") as f:
+            return f.read()
+
+    audio = fetch_mp3(chunk, "en", timeout, slow=slow, tld='com')
+    if len(audio) < 500:
+        raise Exception("Generated audio chunk too small, likely corrupted")
 
-def _check_internet_connection(timeout=5):
-    """Check if internet connection is available"""
-    try:
-        response = requests.get('https://www.google.com', timeout=timeout)
-        return response.status_code == 200
-    except:
-        return False
+    tts_cache.store_bytes(audio, cache_key, "en")
+    return audio
 
 def english_online_tts(
     text: str,
@@ -40,35 +36,34 @@ def english_online_tts(
     if not text.strip():
         raise ValueError("Input text cannot be empty")
 
-    os.makedirs(output_dir, exist_ok=True)
-    cache_key = _generate_cache_key(text)
+    tts_cache.ensure_dir(output_dir)
+    cache_key = tts_cache.generate_cache_key(text, "en", int(slow))
     output_path = os.path.join(output_dir, f"english_online_{cache_key}.mp3")
-    cached_file = os.path.join(CACHE_DIR, f"{cache_key}.mp3")
     
     # Check cache first (faster)
-    with cache_lock:
-        if os.path.exists(cached_file) and os.path.getsize(cached_file) > 0:
-            import shutil
-            shutil.copy2(cached_file, output_path)
-            return output_path
+    cached_file = tts_cache.lookup(cache_key, "en")
+    if cached_file:
+        tts_cache.fast_clone(cached_file, output_path)
+        return output_path
 
     # Check internet connection
-    if not _check_internet_connection():
+    if not check_internet_connection():
         raise Exception("No internet connection available for online TTS")
 
+    # The output may be a link into the cache from an earlier call; never write through it
+    tts_cache.prepare_output(output_path)
+    
     last_error = None
     for attempt in range(max_retries):
         try:
-            # Optimized gTTS settings with timeout handling
-            tts = gTTS(text=text, lang="en", slow=slow, tld='com')
-            
-            # Set timeout for the save operation
-            start_time = time.time()
-            tts.save(output_path)
-            
-            # Check if operation took too long
-            if time.time() - start_time > timeout:
-                raise Exception("TTS generation timeout")
+            # Long documents fan sentence chunks out over parallel requests, each
+            # through the per-chunk cache. The timeout applies to each request,
+            # so a stalled connection is abandoned instead of detected afterwards
+            save_mp3(
+                text, output_path, "en", timeout,
+                fetch_chunk=lambda chunk: _synthesize_chunk(chunk, slow, timeout),
+                slow=slow, tld='com'
+            )
             
             # Validate generated file
             if not os.path.exists(output_path):
@@ -82,12 +77,7 @@ def english_online_tts(
                 raise Exception("Generated audio file too small, likely corrupted")
             
             # Cache for future use
-            with cache_lock:
-                try:
-                    import shutil
-                    shutil.copy2(output_path, cached_file)
-                except:
-                    pass
+            tts_cache.store(output_path, cache_key, "en")
 
             return output_path
             
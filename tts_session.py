@@ -0,0 +1,132 @@
+"""
+Shared gTTS Session Module
+Technology: keep-alive gTTS session and chunked synthesis shared by the English and Urdu engines
+"""
+
+import io
+import re
+import time
+import socket
+import base64
+import urllib.request
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from gtts import gTTS
+from gtts.tts import gTTSError
+import requests
+from requests.adapters import HTTPAdapter
+import urllib3
+
+# One keep-alive session shared by every gTTS request in the process
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0))
+
+# Reachability verdicts are shared by every engine and reused for this many seconds
+NET_CHECK_TTL = 10
+_net_status = [0.0, False]  # [checked_at, reachable]
+
+# Texts longer than this are split into sentence chunks fetched in parallel
+PARALLEL_MIN_CHARS = 200
+MAX_CHUNK_CHARS = 180
+MAX_TTS_WORKERS = 8
+
+# gTTS talks to the API with verify=False; silence the per-request warning once
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+class PooledGTTS(gTTS):
+    """
+    gTTS variant that sends its requests over the shared keep-alive session
+    instead of opening a new connection (and TLS handshake) per request
+    """
+
+    def stream(self):
+        for pr in self._prepare_requests():
+            try:
+                r = SESSION.send(
+                    request=pr,
+                    verify=False,
+                    proxies=urllib.request.getproxies(),
+                    timeout=self.timeout,
+                )
+                r.raise_for_status()
+            except requests.exceptions.HTTPError:
+                raise gTTSError(tts=self, response=r)
+            except requests.exceptions.RequestException:
+                raise gTTSError(tts=self)
+
+            for line in r.iter_lines(chunk_size=1024):
+                decoded_line = line.decode("utf-8")
+                if "jQ1olc" in decoded_line:
+                    audio_search = re.search(r'jQ1olc","\[\\"(.*)\\"]', decoded_line)
+                    if not audio_search:
+                        raise gTTSError(tts=self, response=r)
+                    yield base64.b64decode(audio_search.group(1).encode("ascii"))
+
+def check_internet_connection(timeout=2):
+    """
+    Check if internet connection is available using a cheap TCP connect
+    to a public DNS server, reusing a recent verdict when there is one
+    """
+    now = time.monotonic()
+    if _net_status[0] and now - _net_status[0] < NET_CHECK_TTL:
+        return _net_status[1]
+    
+    try:
+        with socket.create_connection(("8.8.8.8", 53), timeout=timeout):
+            reachable = True
+    except OSError:
+        reachable = False
+    
+    _net_status[:] = [now, reachable]
+    return reachable
+
+@lru_cache(maxsize=None)
+def _sentence_re(enders):
+    """Pattern splitting after any of the sentence-ending characters"""
+    return re.compile(rf'(?<=[{re.escape(enders)}])\s+')
+
+def chunk_text(text, enders=".!?", max_chars=MAX_CHUNK_CHARS):
+    """Split text on sentence ends and pack whole sentences into chunks of up to max_chars"""
+    chunks = []
+    current = ""
+    for sentence in _sentence_re(enders).split(text.strip()):
+        if not sentence.strip():
+            continue
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+def fetch_mp3(text, lang, timeout, **gtts_kwargs):
+    """Fetch one piece of text from gTTS as MP3 bytes"""
+    buffer = io.BytesIO()
+    PooledGTTS(text=text, lang=lang, timeout=timeout, **gtts_kwargs).write_to_fp(buffer)
+    return buffer.getvalue()
+
+def save_mp3(text, path, lang, timeout, enders=".!?", fetch_chunk=None, **gtts_kwargs):
+    """
+    Synthesize text into an MP3 file, fanning long texts out over parallel
+    sentence-chunk requests. fetch_chunk(chunk) -> bytes replaces the plain
+    gTTS fetch for chunks (e.g. to add a per-chunk cache)
+    """
+    if len(text) <= PARALLEL_MIN_CHARS:
+        # Stream response parts straight into the file
+        with open(path, 'wb') as f:
+            PooledGTTS(text=text, lang=lang, timeout=timeout, **gtts_kwargs).write_to_fp(f)
+        return
+    
+    if fetch_chunk is None:
+        def fetch_chunk(chunk):
+            return fetch_mp3(chunk, lang, timeout, **gtts_kwargs)
+    
+    chunks = chunk_text(text, enders)
+    with ThreadPoolExecutor(max_workers=min(MAX_TTS_WORKERS, len(chunks))) as executor, open(path, 'wb') as f:
+        # gTTS segments share one bitrate, so the MP3 frames concatenate as-is;
+        # write each part as soon as it is next in order rather than joining
+        # all of them into one more buffer first
+        for part in executor.map(fetch_chunk, chunks):
+            f.write(part)
@@ -1,27 +1,215 @@
 import os
-import wave
+import mmap
 import time
+import random
 import threading
-from gtts import gTTS
-import requests
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import tts_cache
+import tts_engine
+from tts_session import check_internet_connection, save_mp3
+
+# Socket timeout (seconds) for each gTTS request
+ONLINE_TIMEOUT = 30
+# Urdu full stop (U+06D4) alongside the Latin sentence ends
+SENTENCE_ENDERS = "۔.!?"
+
+# Silence check samples this many evenly spaced windows of PCM data
+SILENCE_WINDOWS = 16
+SILENCE_WINDOW_SAMPLES = 1024
+# Offline WAVs larger than this are trusted without the silence check
+SILENCE_CHECK_MAX_BYTES = 50_000
+
+# Seconds an offline utterance may take before it is abandoned
+OFFLINE_TIMEOUT = 30
+
+# Offline speaking rate; part of the cache key so a change never serves stale audio
+OFFLINE_RATE = 180
+
+@lru_cache(maxsize=256)
+def _urdu_cache_key(text: str, mode: str) -> str:
+    """Cache key for an Urdu request, memoized so repeated phrases skip hashing"""
+    rate = OFFLINE_RATE if mode != "online" else None
+    return tts_cache.generate_cache_key(text, "ur", mode, rate)
+
+def _pcm_layout(mm):
+    """Walk the RIFF chunks and return (sample_width, data_offset, data_length)"""
+    if mm[:4] != b'RIFF' or mm[8:12] != b'WAVE':
+        raise ValueError("Not a WAV file")
+    
+    sample_width = None
+    pos = 12
+    while pos + 8 <= len(mm):
+        chunk_id = mm[pos:pos + 4]
+        chunk_size = int.from_bytes(mm[pos + 4:pos + 8], 'little')
+        body = pos + 8
+        if chunk_id == b'fmt ':
+            sample_width = int.from_bytes(mm[body + 14:body + 16], 'little') // 8
+        elif chunk_id == b'data':
+            if not sample_width:
+                raise ValueError("WAV data chunk precedes its format")
+            # Streaming writers may leave the size unpatched; clamp to the file
+            return sample_width, body, min(chunk_size, len(mm) - body)
+        # Chunks are padded to an even length
+        pos = body + chunk_size + (chunk_size & 1)
+    raise ValueError("WAV file has no data chunk")
+
+def _mapped_is_silent(mm, threshold):
+    """
+    Check evenly spaced windows of the PCM data, viewed in place from the
+    mapping, and stop at the first one that is not silent
+    """
+    sample_width, offset, length = _pcm_layout(mm)
+    count = length // sample_width
+    if count == 0:
+        return True
+    
+    if sample_width == 1:
+        # 8-bit PCM is unsigned and centred on 128
+        samples = np.frombuffer(mm, dtype=np.uint8, count=count, offset=offset)
+        centre, full_scale = 128.0, 128.0
+    elif sample_width in (2, 4):
+        dtype = np.int16 if sample_width == 2 else np.int32
+        samples = np.frombuffer(mm, dtype=dtype, count=count, offset=offset)
+        centre, full_scale = 0.0, float(np.iinfo(dtype).max)
+    else:
+        # Uncommon widths (e.g. 24-bit): fall back to the non-zero byte ratio
+        data = np.frombuffer(mm, dtype=np.uint8, count=length, offset=offset)
+        return np.count_nonzero(data) / data.size < threshold
+    
+    if count <= SILENCE_WINDOW_SAMPLES:
+        starts = [0]
+    else:
+        starts = np.linspace(0, count - SILENCE_WINDOW_SAMPLES, SILENCE_WINDOWS).astype(np.int64)
+    
+    for start in starts:
+        window = samples[start:start + SILENCE_WINDOW_SAMPLES].astype(np.float32) - centre
+        if np.sqrt(np.mean(window * window)) / full_scale >= threshold:
+            return False
+    return True
 
 def _is_audio_silent(wav_file, threshold=0.01):
-    """Check if WAV file contains mostly silent audio"""
+    """Check if WAV file is mostly silent (every sampled window's normalized RMS below threshold)"""
     try:
-        with wave.open(wav_file, 'rb') as wav:
-            frames = wav.readframes(wav.getnframes())
-            non_zero_ratio = sum(1 for b in frames if b != 0) / len(frames)
-            return non_zero_ratio < threshold
+        with open(wav_file, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return True
+            # Map the file so NumPy reads the samples without a bytes copy
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return _mapped_is_silent(mm, threshold)
+        finally:
+            try:
+                mm.close()
+            except BufferError:
+                # A view is still held by a pending traceback; GC unmaps it
+                pass
     except:
         return True
 
-def _check_internet_connection(timeout=5):
-    """Check if internet connection is available"""
+def _urdu_voice_id(engine):
+    """Voice used for offline Urdu: the first installed one"""
+    voices = engine.getProperty("voices")
+    return voices[0].id if voices else None
+
+def _run_offline(text, wav_file, cancel_event):
+    """Synthesize with pyttsx3 and return the WAV path, or raise on failure"""
+    def synthesize(engine):
+        # Settings are per utterance: English TTS shares this engine
+        tts_engine.configure(engine, OFFLINE_RATE, 1.0, _urdu_voice_id(engine))
+        engine.save_to_file(text, wav_file)
+        engine.runAndWait()
+    
     try:
-        response = requests.get('https://www.google.com', timeout=timeout)
-        return response.status_code == 200
-    except:
-        return False
+        # Gives up waiting for the engine once the online side has won
+        tts_engine.run(synthesize, timeout=OFFLINE_TIMEOUT, cancel_event=cancel_event)
+    except Exception:
+        if os.path.exists(wav_file):
+            try:
+                os.remove(wav_file)
+            except OSError:
+                pass
+        raise
+    
+    # Validate offline result; only short outputs are plausibly silent
+    try:
+        file_size = os.path.getsize(wav_file)
+    except OSError:
+        raise Exception("Offline TTS produced no usable audio")
+    
+    if file_size > SILENCE_CHECK_MAX_BYTES or (file_size > 1000 and not _is_audio_silent(wav_file)):
+        return wav_file
+    
+    os.remove(wav_file)
+    raise Exception("Offline TTS produced no usable audio")
+
+def _save_online(text, mp3_file):
+    """Synthesize text with gTTS, fanning long texts out over parallel requests"""
+    save_mp3(text, mp3_file, 'ur', ONLINE_TIMEOUT, enders=SENTENCE_ENDERS, slow=False)
+
+def _run_online(text, mp3_file):
+    """Synthesize with gTTS and return the MP3 path, or raise on failure"""
+    if not check_internet_connection():
+        raise Exception("No internet for online fallback")
+    
+    try:
+        _save_online(text, mp3_file)
+        if os.path.getsize(mp3_file) < 500:
+            raise Exception("Online fallback produced no usable audio")
+    except Exception:
+        # The file is opened before the first response arrives; drop partial output
+        if os.path.exists(mp3_file):
+            os.remove(mp3_file)
+        raise
+    return mp3_file
+
+def _discard_output(future):
+    """Remove the file produced by an engine that lost the race"""
+    if not future.cancelled() and future.exception() is None:
+        try:
+            os.remove(future.result())
+        except OSError:
+            pass
+
+# Shared by every race, one pool per side so online halves never queue behind
+# offline ones waiting for the engine. Losers may still be finishing (offline
+# until its utterance completes or OFFLINE_TIMEOUT, unless cancelled while
+# waiting for the engine; online until ONLINE_TIMEOUT), so each pool has room
+# for them alongside the next request
+_offline_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="urdu-tts-offline")
+_online_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="urdu-tts-online")
+
+def _synthesize_first_completed(text, wav_file, mp3_file):
+    """
+    Run offline and online synthesis in parallel and return whichever
+    produces valid audio first, so the slower engine's latency is hidden
+    """
+    cancel_event = threading.Event()
+    pending = {
+        _offline_pool.submit(_run_offline, text, wav_file, cancel_event),
+        _online_pool.submit(_run_online, text, mp3_file),
+    }
+    errors = []
+    
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        winner = None
+        for future in done:
+            if winner is None and future.exception() is None:
+                winner = future
+            elif future.exception() is None:
+                _discard_output(future)
+            else:
+                errors.append(str(future.exception()))
+        
+        if winner is not None:
+            cancel_event.set()
+            for future in pending:
+                future.add_done_callback(_discard_output)
+            return winner.result()
+    
+    raise Exception(f"Offline TTS failed and online fallback failed: {'; '.join(errors)}")
 
 def generate_urdu_tts(text: str, mode: str = "online", output_file: str = "output/urdu.mp3", max_retries: int = 2):
     if not text or not text.strip():
@@ -29,7 +217,23 @@ def generate_urdu_tts(text: str, mode: str = "online", output_file: str = "outpu
     
     output_dir = os.path.dirname(output_file)
     if output_dir:
-        os.makedirs(output_dir, exist_ok=True)
+        tts_cache.ensure_dir(output_dir)
+    
+    # Offline output is a WAV; the online fallback writes an MP3 beside it
+    base = os.path.splitext(output_file)[0]
+    wav_file = base + ".wav"
+    mp3_file = base + ".mp3"
+    
+    # Serve repeated phrases straight from the shared audio cache
+    cache_key = _urdu_cache_key(text, mode)
+    cached_file = tts_cache.lookup(cache_key, "ur", (".mp3", ".wav"))
+    if cached_file:
+        cached_output = base + os.path.splitext(cached_file)[1]
+        tts_cache.fast_clone(cached_file, cached_output)
+        return cached_output
+    
+    # Outputs may be links into the cache from an earlier call; never write through them
+    tts_cache.prepare_output(output_file, wav_file, mp3_file)
     
     last_error = None
     
@@ -37,83 +241,15 @@ def generate_urdu_tts(text: str, mode: str = "online", output_file: str = "outpu
         try:
             if mode == "online":
                 # Check internet connection first
-                if not _check_internet_connection():
+                if not check_internet_connection():
                     raise Exception("No internet connection for online TTS")
                 
-                # Generate online TTS with timeout
-                tts = gTTS(text=text, lang='ur', slow=False)
-                
-                start_time = time.time()
-                tts.save(output_file)
-                
-                if time.time() - start_time > 30:  # 30 second timeout
-                    raise Exception("TTS generation timeout")
+                # Requests carry ONLINE_TIMEOUT, so a stalled connection raises instead of hanging
+                _save_online(text, output_file)
                 
             else:
-                # Offline mode with improved error handling
-                import pyttsx3
-                engine = None
-                
-                try:
-                    engine = pyttsx3.init()
-                    if not engine:
-                        raise Exception("Failed to initialize TTS engine")
-                    
-                    engine.setProperty("rate", 180)
-                    engine.setProperty("volume", 1.0)
-                    
-                    voices = engine.getProperty("voices")
-                    if voices and len(voices) > 0:
-                        engine.setProperty("voice", voices[0].id)
-                    
-                    wav_file = output_file.replace(".mp3", ".wav") if output_file.endswith(".mp3") else output_file
-                    
-                    # Use threading for timeout protection
-                    generation_complete = threading.Event()
-                    generation_error = None
-                    
-                    def generate_audio():
-                        nonlocal generation_error
-                        try:
-                            engine.save_to_file(text, wav_file)
-                            engine.runAndWait()
-                            generation_complete.set()
-                        except Exception as e:
-                            generation_error = e
-                            generation_complete.set()
-                    
-                    thread = threading.Thread(target=generate_audio)
-                    thread.daemon = True
-                    thread.start()
-                    
-                    if not generation_complete.wait(timeout=30):
-                        raise Exception("Offline TTS generation timeout")
-                    
-                    if generation_error:
-                        raise generation_error
-                    
-                    # Validate offline result
-                    if os.path.exists(wav_file) and os.path.getsize(wav_file) > 1000 and not _is_audio_silent(wav_file):
-                        return wav_file
-                    
-                    # Fallback to online if offline fails
-                    if os.path.exists(wav_file):
-                        os.remove(wav_file)
-                    
-                    if not _check_internet_connection():
-                        raise Exception("Offline TTS failed and no internet for fallback")
-                    
-                    mp3_file = output_file.replace(".wav", ".mp3") if output_file.endswith(".wav") else output_file
-                    tts = gTTS(text=text, lang='ur', slow=False)
-                    tts.save(mp3_file)
-                    output_file = mp3_file
-                    
-                finally:
-                    if engine:
-                        try:
-                            engine.stop()
-                        except:
-                            pass
+                # Offline mode: race pyttsx3 against the online fallback
+                output_file = _synthesize_first_completed(text, wav_file, mp3_file)
             
             # Validate final output
             if not os.path.exists(output_file):
@@ -126,6 +262,7 @@ def generate_urdu_tts(text: str, mode: str = "online", output_file: str = "outpu
             if file_size < 500:
                 raise Exception("Generated audio file too small")
             
+            tts_cache.store(output_file, cache_key, "ur")
             return output_file
             
         except Exception as e:
@@ -138,9 +275,9 @@ def generate_urdu_tts(text: str, mode: str = "online", output_file: str = "outpu
                 except:
                     pass
             
-            # Wait before retry
+            # Wait before retry (exponential backoff with jitter: ~0.1, 0.2, 0.4s, capped at 2s)
             if attempt < max_retries - 1:
-                time.sleep(1)
+                time.sleep(min(2.0, 0.1 * (2 ** attempt)) * random.uniform(0.8, 1.2))
     
     # All retries failed
     raise Exception(f"Urdu TTS failed after {max_retries} attempts: {str(last_error)}")
\ No newline at end of file